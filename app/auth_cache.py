@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+
+import hashlib
+import os
+
+import cachetools
+import jwt
+
+from sqlalchemy import select
+
+from app.hashing import checkpw_async
+from app.models import User
+
+
+_SECRET_KEY = os.environ['SECRET_KEY']
+
+# One PyJWT instance for the process; the module-level jwt.encode/
+# jwt.decode helpers build a fresh PyJWT (and re-resolve the algorithm
+# registry) on every call
+_JWT = jwt.PyJWT()
+
+# Validated token payloads keyed by a token digest, so warm requests
+# skip the HMAC verification and base64/JSON decode entirely; entries
+# age out on their own, a signed token does not stop being valid
+_token_cache = cachetools.TTLCache(maxsize=10000, ttl=30)
+
+
+def _token_key(session_key):
+    return hashlib.blake2b(session_key.encode(), digest_size=16).digest()
+
+
+# Verified (token key, stored hash) pairs; the stored hash is part of
+# the cache key, so rotating a user's session_key makes every cached
+# verdict for the old hash unreachable without explicit eviction
+_bcrypt_verify_cache = cachetools.TTLCache(maxsize=10000, ttl=60)
+
+
+async def verify_session_key(key, hashed):
+    cache_key = hashlib.blake2b(key.encode() + hashed.encode(), digest_size=16).digest()
+    ok = _bcrypt_verify_cache.get(cache_key)
+    if ok is None:
+        ok = await checkpw_async(key.encode(), hashed.encode())
+        _bcrypt_verify_cache[cache_key] = ok
+
+    return ok
+
+
+def encode_session(payload):
+    return _JWT.encode(payload, _SECRET_KEY, algorithm="HS256")
+
+
+def decode_session(session_key):
+    key = _token_key(session_key)
+    payload = _token_cache.get(key)
+    if payload is None:
+        payload = _JWT.decode(session_key, _SECRET_KEY, algorithms=["HS256"])
+        _token_cache[key] = payload
+
+    return payload
+
+
+# The auth-side user row changes only on session rotation or deletion,
+# yet every view re-selected it per request; keep the three fields the
+# auth checks need in a short TTL cache and drop the entry whenever the
+# session_key rotates or the user is removed
+_user_cache = cachetools.TTLCache(maxsize=5000, ttl=60)
+
+
+async def get_cached_user(session, user_id):
+    user = _user_cache.get(user_id)
+    if user is None:
+        row = (await session.execute(select(User).where(User.id == user_id))).scalar()
+        if row is None:
+            return None
+        user = {
+            'id': row.id,
+            'session_key': row.session_key,
+            'is_admin': row.is_admin
+        }
+        _user_cache[user_id] = user
+
+    return user
+
+
+def invalidate_user(user_id):
+    _user_cache.pop(user_id, None)
+
+
+async def authenticate(session, session_key):
+    # The whole warm path is in-process: cached token payload, cached
+    # user row, cached bcrypt verdict — no DB or executor round-trip
+    session_jwt = decode_session(session_key)
+    user = await get_cached_user(session, session_jwt['id'])
+    if user is None or not await verify_session_key(session_jwt['key'], user['session_key']):
+        return None
+
+    return user
@@ -1,16 +1,171 @@
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
 
-import subprocess
-import json
+import asyncio
+import logging
 import os
+import time
 
+from collections import defaultdict
 
-def get_gpu_info():
-    # Get nodes with GPU capacity
-    nodes = json.loads(subprocess.check_output(
-        "microk8s kubectl get nodes -o json", shell=True
-    ))["items"]
+from kubernetes_asyncio import client, config, watch
+
+
+VOLUMES_HOST_PATH = "/home/tigron/orchestr8/volumes"
+
+
+# Shared API client so every call reuses the same pooled
+# keep-alive connections to the API server
+_api_client = None
+_core_v1 = None
+_client_lock = asyncio.Lock()
+
+
+async def get_core_v1():
+    global _api_client, _core_v1
+    if _core_v1 is None:
+        async with _client_lock:
+            if _core_v1 is None:
+                try:
+                    config.load_incluster_config()
+                except config.ConfigException:
+                    await config.load_kube_config()
+                configuration = client.Configuration.get_default_copy()
+                configuration.connection_pool_maxsize = 32
+                _api_client = client.ApiClient(configuration)
+                _core_v1 = client.CoreV1Api(_api_client)
+    return _core_v1
+
+
+async def close_k8s_client():
+    global _api_client, _core_v1
+    if _api_client is not None:
+        await _api_client.close()
+        _api_client = None
+        _core_v1 = None
+
+
+def sanitize(obj):
+    return _api_client.sanitize_for_serialization(obj)
+
+
+# Short-lived cache so bursts of dashboard refreshes collapse into a
+# single API server round-trip; overlapping callers wait on the lock
+# for the in-flight fetch instead of re-running it
+CACHE_TTL = 2.0
+_cache = {}
+_cache_locks = defaultdict(asyncio.Lock)
+
+
+def _cache_get(key):
+    entry = _cache.get(key)
+    if entry and time.monotonic() - entry[0] < CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def _cache_put(key, value):
+    _cache[key] = (time.monotonic(), value)
+
+
+def invalidate_cache(pod_name=None):
+    if pod_name is None:
+        _cache.clear()
+    else:
+        _cache.pop(("pod", pod_name), None)
+        _cache.pop("pods", None)
+        _cache.pop("gpu", None)
+
+
+# Local mirror of the default namespace kept current by a single
+# background watch, so pod lookups never hit the API server
+_pod_cache = {}
+_pod_cache_fresh = False
+_watch_task = None
+
+
+async def _watch_pods():
+    global _pod_cache_fresh
+    while True:
+        try:
+            core_v1 = await get_core_v1()
+            pods = await core_v1.list_namespaced_pod("default")
+            _pod_cache.clear()
+            for pod in pods.items:
+                _pod_cache[pod.metadata.name] = sanitize(pod)
+            _pod_cache_fresh = True
+
+            async with watch.Watch().stream(
+                core_v1.list_namespaced_pod,
+                "default",
+                resource_version=pods.metadata.resource_version
+            ) as stream:
+                async for event in stream:
+                    pod = event["object"]
+                    if event["type"] == "DELETED":
+                        _pod_cache.pop(pod.metadata.name, None)
+                    else:
+                        _pod_cache[pod.metadata.name] = sanitize(pod)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 410 Gone when the resource version expires, or a dropped
+            # connection: mark the mirror stale and relist from scratch
+            _pod_cache_fresh = False
+            logging.error(f"Pod watch failed, relisting: {e}")
+            await asyncio.sleep(1)
+
+
+def start_pod_watch():
+    global _watch_task
+    if _watch_task is None:
+        _watch_task = asyncio.get_running_loop().create_task(_watch_pods())
+
+
+async def stop_pod_watch():
+    global _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        try:
+            await _watch_task
+        except asyncio.CancelledError:
+            pass
+        _watch_task = None
+
+
+async def get_gpu_info():
+    cached = _cache_get("gpu")
+    if cached is not None:
+        return cached
+
+    async with _cache_locks["gpu"]:
+        cached = _cache_get("gpu")
+        if cached is not None:
+            return cached
+
+        info = await _fetch_gpu_info()
+        _cache_put("gpu", info)
+
+    return info
+
+
+async def _fetch_gpu_info():
+    core_v1 = await get_core_v1()
+
+    # Get nodes with GPU capacity; keep the typed client objects so
+    # the hot loops below do attribute lookups instead of rebuilding
+    # the whole payload as nested dicts
+    nodes = (await core_v1.list_node()).items
+
+    # Get every pod once and group them by node instead of
+    # re-listing pods per node; Pending/Succeeded/Failed pods hold no
+    # GPU, so let the API server drop them before they hit the wire
+    pods = (await core_v1.list_pod_for_all_namespaces(
+        field_selector="status.phase=Running"
+    )).items
+    pods_by_node = defaultdict(list)
+    for pod in pods:
+        pods_by_node[pod.spec.node_name].append(pod)
 
     # Cluster-wide totals
     total_gpus = 0
@@ -24,23 +179,23 @@ def get_gpu_info():
 
     # Process nodes
     for node in nodes:
-        capacity = node["status"].get("capacity", {})
+        capacity = node.status.capacity or {}
         if gpu_resource in capacity:
-            node_name = node["metadata"]["name"]
+            node_name = node.metadata.name
             node_total = int(capacity[gpu_resource])
             total_gpus += node_total
 
-            # Get allocated GPUs for this node
+            # Get allocated GPUs for this node; most containers carry
+            # no GPU request, so bail out before allocating fallbacks
             node_allocated = 0
-            pods = json.loads(subprocess.check_output(
-                f"microk8s kubectl get pods --all-namespaces --field-selector spec.nodeName={node_name} -o json",
-                shell=True
-            ))["items"]
-
-            for pod in pods:
-                for container in pod["spec"]["containers"]:
-                    requests = container.get("resources", {}).get("requests", {})
-                    node_allocated += int(requests.get(gpu_resource, 0))
+            for pod in pods_by_node[node_name]:
+                for container in pod.spec.containers:
+                    resources = container.resources
+                    if resources is None:
+                        continue
+                    requests = resources.requests
+                    if requests and gpu_resource in requests:
+                        node_allocated += int(requests[gpu_resource])
 
             node_available = node_total - node_allocated
             allocated_gpus += node_allocated
@@ -64,64 +219,186 @@ def get_gpu_info():
     }
 
 
-def get_pod_info(pod_name):
-    return json.loads(subprocess.check_output(
-        f"microk8s kubectl get pod {pod_name} -n default -o json", shell=True
-    ))
-
-
-def create_pod_yaml(pod_name='', storage_id=0, container_image='', storage_name='', mount_path='/workspace', cpu=0, memory=0, gpu=0, port=0, env=[]):
-    pod_file_name = os.environ['PODS_META_PATH'] + f"/{pod_name}.yaml"
-    with open(pod_file_name, "w") as f:
-        f.write(f"""
-            apiVersion: v1
-            kind: Pod
-            metadata:
-                name: {pod_name}         
-                labels:
-                  app.kubernetes.io/name: {pod_name}
-            spec:{f'''
-                  volumes:
-                    - name: {storage_name}-pv
-                      persistentVolumeClaim:
-                          claimName: {storage_name}
-                  '''
-                  if storage_id != 0
-                  else ''}
-                  containers:
-                        - name: {pod_name}
-                          image: {container_image}
-                          resources:
-                            limits:
-                              cpu: {cpu}
-                              memory: {memory}
-                              {f'nvidia.com/gpu: {gpu}' if gpu > 0 else ''}
-                          ports:
-                          - containerPort: {port}
-                          {f'''
-                          volumeMounts:
-                              - mountPath: "{mount_path}"
-                                name: {storage_name}-pv
-                            '''
-                          if storage_id != 0
-                          else ''
-                          }
-                          {
-                          '''
-                          env:
-                          '''
-                          if env 
-                          else ''
-                          }
-                          {'\n'.join([f'''
-                              - name: {e['name']}
-                                value: '{e['value']}'
-                            ''' for e in env])
-                          if env 
-                          else ''
-                          }
-        """)
-
-    return pod_file_name
+async def get_pods_info(pod_names):
+    if _pod_cache_fresh:
+        return {name: _pod_cache.get(name) for name in pod_names}
+
+    pods = _cache_get("pods")
+    if pods is None:
+        async with _cache_locks["pods"]:
+            pods = _cache_get("pods")
+            if pods is None:
+                core_v1 = await get_core_v1()
+                items = sanitize(await core_v1.list_namespaced_pod("default"))["items"]
+                pods = {pod["metadata"]["name"]: pod for pod in items}
+                _cache_put("pods", pods)
+
+    return {name: pods.get(name) for name in pod_names}
+
+
+async def get_pod_info(pod_name):
+    if _pod_cache_fresh:
+        info = _pod_cache.get(pod_name)
+        if info is not None:
+            return info
+
+    cached = _cache_get(("pod", pod_name))
+    if cached is not None:
+        return cached
+
+    async with _cache_locks[("pod", pod_name)]:
+        cached = _cache_get(("pod", pod_name))
+        if cached is not None:
+            return cached
+
+        core_v1 = await get_core_v1()
+        info = sanitize(await core_v1.read_namespaced_pod(pod_name, "default"))
+        _cache_put(("pod", pod_name), info)
+
+    return info
+
+
+def build_pod_manifest(pod_name='', storage_id=0, container_image='', storage_name='', mount_path='/workspace', cpu=0, memory=0, gpu=0, port=0, env=[]):
+    limits = {
+        "cpu": cpu,
+        "memory": memory
+    }
+    if gpu > 0:
+        limits["nvidia.com/gpu"] = gpu
+
+    container = {
+        "name": pod_name,
+        "image": container_image,
+        "resources": {"limits": limits},
+        "ports": [{"containerPort": port}]
+    }
+
+    spec = {"containers": [container]}
+    if storage_id != 0:
+        spec["volumes"] = [{
+            "name": f"{storage_name}-pv",
+            "persistentVolumeClaim": {"claimName": storage_name}
+        }]
+        container["volumeMounts"] = [{
+            "mountPath": mount_path,
+            "name": f"{storage_name}-pv"
+        }]
+
+    if env:
+        container["env"] = [{"name": e["name"], "value": str(e["value"])} for e in env]
+
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {
+            "name": pod_name,
+            "labels": {
+                "app.kubernetes.io/name": pod_name
+            }
+        },
+        "spec": spec
+    }
+
+
+def build_service_manifest(pod_name, port, external_port, protocol):
+    return {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {
+            "name": f"{pod_name}-{port}"
+        },
+        "spec": {
+            "type": "NodePort",
+            "ports": [{
+                "protocol": protocol,
+                "port": port,
+                "targetPort": port,
+                "nodePort": external_port
+            }],
+            "selector": {
+                "app.kubernetes.io/name": pod_name
+            }
+        }
+    }
+
+
+def build_volume_manifests(name, capacity):
+    pv = {
+        "apiVersion": "v1",
+        "kind": "PersistentVolume",
+        "metadata": {
+            "name": f"{name}-pv",
+            "labels": {
+                "type": "local"
+            }
+        },
+        "spec": {
+            "storageClassName": "manual",
+            "capacity": {"storage": capacity},
+            "accessModes": ["ReadWriteOncePod"],
+            "hostPath": {"path": f"{VOLUMES_HOST_PATH}/{name}-pv"}
+        }
+    }
+
+    pvc = {
+        "apiVersion": "v1",
+        "kind": "PersistentVolumeClaim",
+        "metadata": {
+            "name": name
+        },
+        "spec": {
+            "storageClassName": "manual",
+            "accessModes": ["ReadWriteOncePod"],
+            "resources": {"requests": {"storage": capacity}}
+        }
+    }
+
+    return pv, pvc
+
+
+async def create_pod_from_manifest(manifest):
+    core_v1 = await get_core_v1()
+    await core_v1.create_namespaced_pod(namespace="default", body=manifest)
+
+
+async def create_volume_from_manifests(pv_manifest, pvc_manifest):
+    core_v1 = await get_core_v1()
+    await core_v1.create_persistent_volume(body=pv_manifest)
+    await core_v1.create_namespaced_persistent_volume_claim(namespace="default", body=pvc_manifest)
+
+
+async def create_service_from_manifest(manifest):
+    core_v1 = await get_core_v1()
+    await core_v1.create_namespaced_service(namespace="default", body=manifest)
+
+
+# Deletes stay best-effort like the kubectl calls they replace: a
+# missing object is logged, not raised, so DB cleanup still completes
+async def delete_pod_object(pod_name):
+    core_v1 = await get_core_v1()
+    try:
+        await core_v1.delete_namespaced_pod(pod_name, "default")
+    except client.ApiException as e:
+        logging.error(f"Deleting pod {pod_name} failed: {e.reason}")
+
+
+async def delete_service_object(service_name):
+    core_v1 = await get_core_v1()
+    try:
+        await core_v1.delete_namespaced_service(service_name, "default")
+    except client.ApiException as e:
+        logging.error(f"Deleting service {service_name} failed: {e.reason}")
+
+
+async def delete_volume_objects(name):
+    core_v1 = await get_core_v1()
+    try:
+        await core_v1.delete_namespaced_persistent_volume_claim(name, "default")
+    except client.ApiException as e:
+        logging.error(f"Deleting pvc {name} failed: {e.reason}")
+    try:
+        await core_v1.delete_persistent_volume(f"{name}-pv")
+    except client.ApiException as e:
+        logging.error(f"Deleting pv {name}-pv failed: {e.reason}")
 
 
@@ -22,8 +22,16 @@ connection_string = f"postgresql+psycopg://{os.environ['DB_USER']}:{os.environ['
 engine = create_async_engine(
     connection_string,
     poolclass=AsyncAdaptedQueuePool,
+    pool_size=20,
+    max_overflow=20,
     pool_pre_ping=True,
-    max_overflow=80
+    pool_recycle=1800,
+    # Room for every statement shape the views emit, so none of them
+    # gets recompiled once the cache is warm
+    query_cache_size=1200,
+    # psycopg prepares statements from the first execution instead of
+    # waiting for the default five repetitions
+    connect_args={"prepare_threshold": 0}
 )
 session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
@@ -0,0 +1,37 @@
+# SPDX-License-Identifier: LGPL-2.1-or-later
+
+
+import asyncio
+import concurrent.futures
+import os
+
+import bcrypt
+
+
+# Single seam for the password-hash backend: views and the auth cache
+# import from here, so trying out a faster implementation (or argon2)
+# later means changing these three names in one place. The stock
+# bcrypt wheel is already the OpenBSD C implementation, so nothing is
+# swapped today — new backends also have to keep verifying the $2b$
+# hashes already in the users table.
+gensalt = bcrypt.gensalt
+hashpw = bcrypt.hashpw
+checkpw = bcrypt.checkpw
+
+
+# A bcrypt verification at cost 12 holds a core for tens of
+# milliseconds; run it on a dedicated pool so the event loop keeps
+# serving other requests meanwhile. Threads are enough — the C
+# extension releases the GIL while it computes, so hashes genuinely
+# run in parallel across cores — and bounding the pool at cpu_count
+# means an auth storm queues here instead of starving the default
+# executor that run_in_executor(None, ...) callers share.
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+async def hashpw_async(password, salt):
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, hashpw, password, salt)
+
+
+async def checkpw_async(password, hashed):
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, checkpw, password, hashed)
@@ -15,13 +15,6 @@ class User(SQLModel, table=True):
     is_admin: bool
     session_key: str | None  # sha1(id|ip|user-agent)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "username": self.username,
-            "is_admin": self.is_admin
-        }
-
 
 class Storage(SQLModel, table=True):
     __tablename__ = "storage"
@@ -34,13 +27,6 @@ class Storage(SQLModel, table=True):
     # keys
     user_id: int = Field(index=True, foreign_key="user.id")
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'capacity': self.capacity
-        }
-
 
 class Pod(SQLModel, table=True):
     __tablename__ = "pod"
@@ -59,16 +45,6 @@ class Pod(SQLModel, table=True):
     user_id: int = Field(index=True, foreign_key="user.id")
     storage_id: int | None = Field(index=True, foreign_key="storage.id")
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'cpu': self.cpu,
-            'memory': self.memory,
-            'gpu': self.gpu,
-            'storage_id': self.storage_id
-        }
-
 
 class ReservedPort(SQLModel, table=True):
     __tablename__ = "reserved_port"
@@ -83,14 +59,6 @@ class ReservedPort(SQLModel, table=True):
     user_id: int = Field(index=True, foreign_key="user.id")
     pod_id: int = Field(index=True, foreign_key="pod.id")
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'port': self.port,
-            'external_port': self.external_port,
-            'protocol': self.protocol
-        }
-
 
 class PodEnv(SQLModel, table=True):
     __tablename__ = "pod_env"
@@ -103,12 +71,6 @@ class PodEnv(SQLModel, table=True):
     user_id: int = Field(index=True, foreign_key="user.id")
     pod_id: int = Field(index=True, foreign_key="pod.id")
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'value': self.value
-        }
 
 
 
@@ -1,13 +1,16 @@
 # SPDX-License-Identifier: LGPL-2.1-or-later
 
 
-import json
 import logging
 import traceback
 
 from fastapi import APIRouter, Request, Response, WebSocket
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
-from app.core import get_pod_info
+import orjson
+
+from app import models
+from app.core import get_pods_info
 from app.views import (
     get_docker_token,
     docker_search_image,
@@ -36,6 +39,47 @@ from app.views import (
 from app.schemas import Pod, Storage, User, Id, PodPort, PodEnv
 
 
+# Only these fields ever leave the API; serialized straight from the
+# model rows by orjson instead of a per-row to_dict call
+_MODEL_FIELDS = {
+    models.User: ("id", "username", "is_admin"),
+    models.Storage: ("id", "name", "capacity"),
+    models.Pod: ("id", "name", "cpu", "memory", "gpu", "storage_id"),
+    models.ReservedPort: ("id", "port", "external_port", "protocol"),
+    models.PodEnv: ("id", "name", "value"),
+}
+
+
+def _model_default(obj):
+    fields = _MODEL_FIELDS.get(type(obj))
+    if fields is None:
+        raise TypeError
+    return {field: getattr(obj, field) for field in fields}
+
+
+class ModelJSONResponse(ORJSONResponse):
+
+    def render(self, content):
+        return orjson.dumps(content, default=_model_default)
+
+
+def stream_json(rows):
+    # Emit one serialized row per chunk so large listings never sit in
+    # memory twice (object tree + full payload buffer)
+    async def gen():
+        yield b"["
+        first = True
+        for row in rows:
+            if first:
+                first = False
+            else:
+                yield b","
+            yield orjson.dumps(row, default=_model_default)
+        yield b"]"
+
+    return StreamingResponse(gen(), media_type="application/json")
+
+
 router = APIRouter()
 
 
@@ -69,8 +113,9 @@ async def create_pod_route(item: Pod, request: Request):
 async def get_pods_route(request: Request):
     status, res = await get_pods(session_key=request.headers.get("Authorization"))
     if status == 200:
-        pods = [{**(i.to_dict()), "k8s_info": get_pod_info(i.name)} for i in res]
-        return Response(json.dumps(pods), status_code=status)
+        pods_info = await get_pods_info([i["name"] for i in res])
+        pods = [{**i, "k8s_info": pods_info[i["name"]]} for i in res]
+        return stream_json(pods)
     else:
         return Response(res, status_code=status)
 
@@ -85,7 +130,7 @@ async def delete_pod_route(item: Id, request: Request):
 async def get_pod_ports_route(request: Request, pod_id: int):
     status, res = await get_pod_ports(pod_id=pod_id, session_key=request.headers.get("Authorization"))
     if status == 200:
-        return Response(json.dumps([i.to_dict() for i in res]), status_code=status)
+        return ModelJSONResponse(res, status_code=status)
     else:
         return Response(res, status_code=status)
 
@@ -112,7 +157,7 @@ async def create_volume_route(item: Storage, request: Request):
 async def get_volumes_route(request: Request):
     status, res = await get_volumes(session_key=request.headers.get("Authorization"))
     if status == 200:
-        return Response(json.dumps([i.to_dict() for i in res]), status_code=status)
+        return ModelJSONResponse(res, status_code=status)
     else:
         return Response(res, status_code=status)
 
@@ -127,7 +172,7 @@ async def delete_volume_route(item: Id, request: Request):
 async def get_gpus_route(request: Request):
     status, res = await get_gpus_available(session_key=request.headers.get("Authorization"))
     if status == 200:
-        return Response(json.dumps(res), status_code=status)
+        return ORJSONResponse(res, status_code=status)
     else:
         return Response(res, status_code=status)
 
@@ -148,7 +193,7 @@ async def login_route(item: User):
 async def stat(request: Request):
     status, res = await get_stat(session_key=request.headers.get("Authorization"))
     if status == 200:
-        return Response(json.dumps(res), status_code=status)
+        return ORJSONResponse(res, status_code=status)
     else:
         return Response(res, status_code=status)
 
@@ -157,7 +202,7 @@ async def stat(request: Request):
 async def users(request: Request):
     status, res = await get_users(session_key=request.headers.get("Authorization"))
     if status == 200:
-        return Response(json.dumps([i.to_dict() for i in res]), status_code=status)
+        return stream_json(res)
     else:
         return Response(res, status_code=status)
 
@@ -172,7 +217,7 @@ async def login_route(item: Id, request: Request):
 async def get_pod_envs_route(request: Request, pod_id: int):
     status, res = await get_pod_envs(pod_id=pod_id, session_key=request.headers.get("Authorization"))
     if status == 200:
-        return Response(json.dumps([i.to_dict() for i in res]), status_code=status)
+        return ModelJSONResponse(res, status_code=status)
     else:
         return Response(res, status_code=status)
 
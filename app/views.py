@@ -2,144 +2,187 @@
 
 
 import subprocess
-import os
 import re
 import psutil
 import shutil
 import GPUtil
 
 import asyncio
+import cachetools
 import aiohttp
-import random
-import string
+import secrets
 import logging
+import time
 
 from fastapi import WebSocket
 from tenacity import retry, stop_after_attempt, wait_exponential
-import bcrypt
-import jwt
-from sqlalchemy import select, func
+from sqlalchemy import select, func, Sequence
 
+from app.auth_cache import authenticate, encode_session, invalidate_user
 from app.db import get_session
-from app.core import get_gpu_info, create_pod_yaml
+from app.hashing import checkpw_async, gensalt, hashpw_async
+from app.core import (
+    VOLUMES_HOST_PATH,
+    get_gpu_info,
+    build_pod_manifest,
+    build_service_manifest,
+    build_volume_manifests,
+    create_pod_from_manifest,
+    create_service_from_manifest,
+    create_volume_from_manifests,
+    delete_pod_object,
+    delete_service_object,
+    delete_volume_objects,
+    invalidate_cache
+)
 from app.models import User, Storage, Pod, ReservedPort, PodEnv
 
 
+# Names end up in Kubernetes object metadata and host paths, so only
+# RFC 1123 labels get past the front door
+_NAME_RE = re.compile(r'^[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?$')
+
+# NodePort numbers come from a Postgres sequence (see the
+# add_external_port_sequence migration)
+_EXTERNAL_PORT_SEQ = Sequence('reserved_port_ext_seq')
+
+
+# One keep-alive session for all outbound Docker Hub traffic; building
+# a ClientSession per call paid DNS + TCP + TLS setup every time, and
+# the tenacity retries around the callers cover stale keep-alive sockets
+_http_session = None
+_http_session_lock = asyncio.Lock()
+
+
+async def get_http_session():
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        async with _http_session_lock:
+            if _http_session is None or _http_session.closed:
+                _http_session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+                )
+    return _http_session
+
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+        _http_session = None
+
+
 @retry(reraise=True, stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=0.2, max=3))
+async def _fetch_docker_token():
+    session = await get_http_session()
+    url = f"https://auth.docker.io/token"
+    async with session.get(url) as response:
+        if response.status == 200:
+            data = await response.json()
+            return data['token'], data.get('expires_in', 300)
+
+        logging.error(f"Cannot get token cause of: {await response.text()}")
+        return None, 0
+
+
+# Anonymous Hub tokens live ~5 minutes; reuse one until shortly before
+# it expires, and let concurrent misses wait on the lock for the single
+# in-flight fetch instead of each doing their own
+_docker_token = None
+_docker_token_lock = asyncio.Lock()
+
+
 async def get_docker_token():
-    async with aiohttp.ClientSession() as session:
-        url = f"https://auth.docker.io/token"
-        async with session.get(url) as response:
-            if response.status == 200:
-                token = await response.json()
-                token = token['token']
-            else:
-                logging.error(f"Cannot get token cause of: {await response.text()}")
-                token = None
+    global _docker_token
+    if _docker_token and time.monotonic() < _docker_token[1]:
+        return _docker_token[0]
+
+    async with _docker_token_lock:
+        if _docker_token and time.monotonic() < _docker_token[1]:
+            return _docker_token[0]
 
-        return token
+        token, expires_in = await _fetch_docker_token()
+        if token is not None:
+            # Renew 30 s early so callers never hand out a token that
+            # dies mid-request
+            _docker_token = (token, time.monotonic() + expires_in - 30)
+
+    return token
 
 
 @retry(reraise=True, stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=0.2, max=3))
 async def docker_search_image(text, headers):
-    async with aiohttp.ClientSession() as session:
-        url = f"https://hub.docker.com/api/search/v4?query=${text}&from=0&size=20"
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-            else:
-                print(headers, url)
-                logging.error(f"Cannot get search results cause of: {await response.text()}")
-                data = None
+    session = await get_http_session()
+    url = f"https://hub.docker.com/api/search/v4?query=${text}&from=0&size=20"
+    async with session.get(url, headers=headers) as response:
+        if response.status == 200:
+            data = await response.json()
+        else:
+            print(headers, url)
+            logging.error(f"Cannot get search results cause of: {await response.text()}")
+            data = None
 
-        return data
+    return data
 
 
 async def create_volume(name='', capacity='', session_key=''):
-    session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
     async with get_session() as session:
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        name_s = name.strip().replace(" ", "_")
+        name_s = name.strip().replace(" ", "-")
+        if not _NAME_RE.match(name_s):
+            return 400, "Invalid Request."
 
         storage = Storage(
             name=name_s,
             capacity=capacity,
-            user_id=user.id
+            user_id=user['id']
         )
         session.add(storage)
         await session.flush()
 
-        storage_file_name_pv = os.environ['VOLUMES_META_PATH'] + f"/{name_s}-pv.yaml"
-        with open(storage_file_name_pv, "w") as f:
-            f.write(f"""
-                apiVersion: v1
-                kind: PersistentVolume
-                metadata:
-                  name: {name_s}-pv
-                  labels:
-                    type: local
-                spec:
-                  storageClassName: manual
-                  capacity:
-                    storage: {capacity}
-                  accessModes:
-                    - ReadWriteOncePod
-                  hostPath:
-                    path: "/home/tigron/orchestr8/volumes/{name_s}-pv"
-                
-            """)
-
-        storage_file_name_pvc = os.environ['VOLUMES_META_PATH'] + f"/{name_s}-pvc.yaml"
-        with open(storage_file_name_pvc, "w") as f:
-            f.write(f"""
-                apiVersion: v1
-                kind: PersistentVolumeClaim
-                metadata:
-                    name: {name_s}
-                spec:
-                    storageClassName: manual
-                    accessModes:
-                        - ReadWriteOncePod
-                    resources:
-                        requests:
-                            storage: {capacity}
-            """)
-
-        subprocess.run(f"microk8s kubectl apply -f {storage_file_name_pv}", shell=True)
-        subprocess.run(f"microk8s kubectl apply -f {storage_file_name_pvc}", shell=True)
+        pv_manifest, pvc_manifest = build_volume_manifests(name_s, capacity)
+        await create_volume_from_manifests(pv_manifest, pvc_manifest)
 
     return 200, "OK."
 
 
 async def get_volumes(session_key=''):
-    session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
     async with get_session() as session:
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        storages = (await session.execute(select(Storage).where(Storage.user_id == session_jwt['id']))).scalars()
+        # Column select: plain dicts for the serializer, no ORM
+        # instances or identity-map bookkeeping for a read-only listing
+        storages = [dict(row) for row in (await session.execute(
+            select(Storage.id, Storage.name, Storage.capacity)
+            .where(Storage.user_id == user['id'])
+        )).mappings()]
 
     return 200, storages
 
 
 async def create_pod(name='', container_image='', cpu='', memory='', mount_path='/workspace', gpu=0, storage_id=0, port=80, session_key=''):
-    session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
     async with get_session() as session:
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        storages = (await session.execute(select(Storage).where(Storage.user_id == session_jwt['id']))).scalars()
-        storage = None
-        for store in storages:
-            if store.id == storage_id:
-                storage = store
+        name_s = name.strip().replace(" ", "-")
+        if not _NAME_RE.match(name_s):
+            return 400, "Invalid Request."
 
-        name_s = name.strip().replace(" ", "_")
+        storage = None
+        if storage_id != 0:
+            storage = (await session.execute(select(Storage).where(
+                Storage.id == storage_id,
+                Storage.user_id == user['id']
+            ))).scalar_one_or_none()
+            if storage is None:
+                return 403, "Invalid credentials."
 
         pod = Pod(
             name=name_s,
@@ -148,14 +191,14 @@ async def create_pod(name='', container_image='', cpu='', memory='', mount_path=
             memory=memory,
             gpu=gpu,
             port=port,
-            user_id=user.id,
+            user_id=user['id'],
             storage_id=storage_id if storage_id != 0 else None,
             mount_path=mount_path
         )
         session.add(pod)
         await session.flush()
 
-        pod_file_name = create_pod_yaml(
+        manifest = build_pod_manifest(
             pod_name=name_s,
             storage_id=storage_id,
             container_image=container_image,
@@ -167,19 +210,22 @@ async def create_pod(name='', container_image='', cpu='', memory='', mount_path=
             mount_path=mount_path
         )
 
-        subprocess.run(f"microk8s kubectl apply -f {pod_file_name}", shell=True)
+        await create_pod_from_manifest(manifest)
+        invalidate_cache(name_s)
 
     return 200, "OK."
 
 
 async def get_pods(session_key=''):
-    session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
     async with get_session() as session:
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
+        pods = [dict(row) for row in (await session.execute(
+            select(Pod.id, Pod.name, Pod.cpu, Pod.memory, Pod.gpu, Pod.storage_id)
+            .where(Pod.user_id == user['id'])
+        )).mappings()]
 
     return 200, pods
 
@@ -192,28 +238,37 @@ async def register(username='', password='', session_key=''):
             is_admin = True
 
         if users > 0:
-            session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-            user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-            if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+            user = await authenticate(session, session_key)
+            if user is None:
                 return 403, "Invalid credentials."
-            if not user.is_admin:
+            if not user['is_admin']:
                 return 403, "Invalid credentials."
 
+        key = secrets.token_urlsafe(22)
+
+        # Two independent bcrypt runs; overlap them on the thread pool
+        # instead of paying for them back to back. The session key is
+        # 30 chars of CSPRNG output, not a guessable password, so the
+        # minimum work factor is plenty for it
+        password_hash, key_hash = await asyncio.gather(
+            hashpw_async(password.encode(), gensalt()),
+            hashpw_async(key.encode(), gensalt(rounds=4))
+        )
+
         user = User(
             username=username,
-            password=bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode(),
+            password=password_hash.decode(),
             is_admin=is_admin
         )
         session.add(user)
         await session.flush()
 
-        key = ''.join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(30))
-        session_jwt = jwt.encode({
+        session_jwt = encode_session({
             'id': user.id,
             'key': key
-        }, os.environ['SECRET_KEY'], algorithm="HS256")
+        })
 
-        user.session_key = bcrypt.hashpw(key.encode(), bcrypt.gensalt()).decode()
+        user.session_key = key_hash.decode()
 
     return 200, session_jwt
 
@@ -228,28 +283,33 @@ async def login(username='', password=''):
             else:
                 return 403, "Invalid credentials."
 
-        if not bcrypt.checkpw(password.encode(), user.password.encode()):
+        if not await checkpw_async(password.encode(), user.password.encode()):
             return 403, "Invalid credentials."
 
-        key = ''.join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(30))
-        session_jwt = jwt.encode({
+        key = secrets.token_urlsafe(22)
+        session_jwt = encode_session({
             'id': user.id,
             'key': key
-        }, os.environ['SECRET_KEY'], algorithm="HS256")
+        })
 
-        user.session_key = bcrypt.hashpw(key.encode(), bcrypt.gensalt()).decode()
+        # The session key is 30 chars of CSPRNG output, not a guessable
+        # password, so the minimum work factor is plenty
+        user.session_key = (await hashpw_async(key.encode(), gensalt(rounds=4))).decode()
         session.add(user)
+        invalidate_user(user.id)
 
     return 200, session_jwt
 
 
-async def get_stat(session_key=''):
-    session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-    async with get_session() as session:
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
-            return 403, "Invalid credentials."
+# Host stats change slower than dashboards poll them: sample once per
+# second and hand the same dict to every caller in the window, with
+# GPUtil (which shells out to nvidia-smi) kept off the event loop
+_stat_cache = cachetools.TTLCache(maxsize=1, ttl=1.0)
+_stat_lock = asyncio.Lock()
+
 
+def _host_stat():
+    memory = psutil.virtual_memory()
     stat = {
         'cpu': {},
         'ram': {},
@@ -260,261 +320,265 @@ async def get_stat(session_key=''):
     stat['cpu']['used'] = psutil.cpu_percent()
     stat['cpu']['free'] = 100.0 - stat['cpu']['used']
 
-    stat['ram']['used'] = psutil.virtual_memory().percent
-    stat['ram']['free'] = psutil.virtual_memory().available * 100 / psutil.virtual_memory().total
+    stat['ram']['used'] = memory.percent
+    stat['ram']['free'] = memory.available * 100 / memory.total
 
     stat['disk']['used'] = psutil.disk_usage('/').percent
     stat['disk']['free'] = 100.0 - stat['disk']['used']
 
-    gpus = GPUtil.getGPUs()
-    for gpu in gpus:
-        gpu_dict = {
+    return stat
+
+
+def _gpu_stat():
+    return [
+        {
             'load': gpu.load * 100.0,
             'memory': gpu.memoryUsed / gpu.memoryTotal
         }
-        stat['gpu'].append(gpu_dict)
+        for gpu in GPUtil.getGPUs()
+    ]
+
 
-    return 200, stat
+async def _collect_stat():
+    stat = _stat_cache.get("stat")
+    if stat is None:
+        async with _stat_lock:
+            stat = _stat_cache.get("stat")
+            if stat is None:
+                loop = asyncio.get_running_loop()
+                stat, gpus = await asyncio.gather(
+                    loop.run_in_executor(None, _host_stat),
+                    loop.run_in_executor(None, _gpu_stat)
+                )
+                stat['gpu'] = gpus
+                _stat_cache["stat"] = stat
+
+    return stat
+
+
+async def get_stat(session_key=''):
+    async with get_session() as session:
+        user = await authenticate(session, session_key)
+        if user is None:
+            return 403, "Invalid credentials."
+
+    return 200, await _collect_stat()
 
 
 async def get_gpus_available(session_key=''):
-    session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
     async with get_session() as session:
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-    return 200, get_gpu_info()
+    return 200, await get_gpu_info()
 
 
 async def get_users(session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
-        if not user.is_admin:
+        if not user['is_admin']:
             return 403, "Invalid credentials."
 
-        users = (await session.execute(select(User))).scalars()
+        users = [dict(row) for row in (await session.execute(
+            select(User.id, User.username, User.is_admin)
+        )).mappings()]
 
     return 200, users
 
 
 async def delete_user(user_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
-        if not user.is_admin:
+        if not user['is_admin']:
             return 403, "Invalid credentials."
 
         user = (await session.execute(select(User).where(User.id == user_id))).scalar()
         await session.delete(user)
+        invalidate_user(user_id)
 
     return 200, "Done."
 
 
 async def delete_pod(pod_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        # Ownership check and fetch in one indexed lookup instead of
+        # hydrating the user's whole pod list to pick a row
+        pod = (await session.execute(select(Pod).where(
+            Pod.id == pod_id,
+            Pod.user_id == user['id']
+        ))).scalar_one_or_none()
+        if pod is None:
             return 403, "Invalid credentials."
 
-        pod = [i for i in pods if i.id == pod_id][0]
-
         reserved_ports = (await session.execute(select(ReservedPort).where(
-            ReservedPort.user_id == session_jwt['id'],
+            ReservedPort.user_id == user['id'],
             ReservedPort.pod_id == pod.id
         ))).scalars()
+        svc_deletes = []
         for reserved_port in reserved_ports:
             await session.delete(reserved_port)
-            subprocess.run(f"microk8s kubectl delete svc {pod.name}-{reserved_port.port} -n default", shell=True)
+            svc_deletes.append(delete_service_object(f"{pod.name}-{reserved_port.port}"))
+
+        # Session work has to stay sequential, but the service deletes
+        # are independent of each other
+        if svc_deletes:
+            await asyncio.gather(*svc_deletes)
 
         envs = (await session.execute(select(PodEnv).where(
-            PodEnv.user_id == session_jwt['id'],
+            PodEnv.user_id == user['id'],
             PodEnv.pod_id == pod.id
         ))).scalars()
         for env in envs:
             await session.delete(env)
 
-    async with get_session() as session:
-        regex = re.compile(f"{pod.name}.*")
-        pod_file_names = [
-            i
-            for i in os.listdir(os.environ['PODS_META_PATH'])
-            if re.match(regex, i)
-        ]
-        for pod_file_name in pod_file_names:
-            os.remove(f"{os.environ['PODS_META_PATH']}/{pod_file_name}")
-
         await session.delete(pod)
 
-        subprocess.run(f"microk8s kubectl delete pod {pod.name} -n default", shell=True)
+        await delete_pod_object(pod.name)
+        invalidate_cache(pod.name)
 
     return 200, "Done."
 
 
 async def get_pod_ports(pod_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        # One round-trip: the outer join keeps the pod row even when it
+        # has no ports, so an empty result can only mean the pod isn't
+        # the caller's
+        rows = (await session.execute(
+            select(Pod.id, ReservedPort)
+            .outerjoin(ReservedPort, ReservedPort.pod_id == Pod.id)
+            .where(Pod.id == pod_id, Pod.user_id == user['id'])
+        )).all()
+        if not rows:
             return 403, "Invalid credentials."
 
-        pod = [i for i in pods if i.id == pod_id][0]
-
-        pod_ports = (await session.execute(select(ReservedPort).where(
-            ReservedPort.user_id == session_jwt['id'],
-            ReservedPort.pod_id == pod.id
-        ))).scalars()
+        pod_ports = [port for _, port in rows if port is not None]
 
     return 200, pod_ports
 
 
 async def add_exposed_port_to_pod(pod_id=0, port=0, protocol='TCP', session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        pod = (await session.execute(select(Pod).where(
+            Pod.id == pod_id,
+            Pod.user_id == user['id']
+        ))).scalar_one_or_none()
+        if pod is None:
             return 403, "Invalid credentials."
 
-        pod = [i for i in pods if i.id == pod_id][0]
-        reserved_ports = (await session.execute(select(ReservedPort).where(
-            ReservedPort.user_id == session_jwt['id'],
-            ReservedPort.pod_id == pod.id
-        ))).scalars()
-        if port in [i.port for i in reserved_ports]:
+        # Existence probe instead of hydrating every reserved port just
+        # to look for a duplicate
+        duplicate = (await session.execute(select(ReservedPort.id).where(
+            ReservedPort.pod_id == pod.id,
+            ReservedPort.port == port
+        ).limit(1))).scalar_one_or_none()
+        if duplicate is not None:
             return 400, "Invalid Request."
 
-        port_to_reserve = (await session.execute(select(func.max(ReservedPort.external_port)))).scalar()
-        if not port_to_reserve:
-            port_to_reserve = 30001
-        else:
-            port_to_reserve += 1
+        # One round-trip and race-free: two concurrent requests can't
+        # read the same MAX and reserve the same port anymore
+        port_to_reserve = (await session.execute(select(_EXTERNAL_PORT_SEQ.next_value()))).scalar()
 
         reserved_port = ReservedPort(
             port=port,
             external_port=port_to_reserve,
             protocol=protocol,
-            user_id=user.id,
+            user_id=user['id'],
             pod_id=pod.id
         )
         session.add(reserved_port)
         await session.flush()
 
-        service_yaml = f"""
-            apiVersion: v1
-            kind: Service
-            metadata:
-              name: {pod.name}-{reserved_port.port}
-            spec:
-              type: NodePort
-              ports:
-                - protocol: {protocol}
-                  port: {reserved_port.port}
-                  targetPort: {reserved_port.port}
-                  nodePort: {reserved_port.external_port}
-              selector:
-                app.kubernetes.io/name: {pod.name}
-        """
-
-        pod_file_name = os.environ['PODS_META_PATH'] + f"/{pod.name}-{reserved_port.port}.yaml"
-        with open(pod_file_name, "w") as f:
-            f.write(service_yaml)
-
-        subprocess.run(f"microk8s kubectl apply -f {pod_file_name}", shell=True)
+        service_manifest = build_service_manifest(
+            pod.name, reserved_port.port, reserved_port.external_port, protocol
+        )
+
+        await create_service_from_manifest(service_manifest)
 
     return 200, "Done."
 
 
 async def delete_exposed_port(pod_id=0, port_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        pod = (await session.execute(select(Pod).where(
+            Pod.id == pod_id,
+            Pod.user_id == user['id']
+        ))).scalar_one_or_none()
+        if pod is None:
             return 403, "Invalid credentials."
 
-        pod = [i for i in pods if i.id == pod_id][0]
-
-        reserved_ports = (await session.execute(select(ReservedPort).where(ReservedPort.user_id == session_jwt['id']))).scalars()
-        reserved_ports = [i for i in reserved_ports]
-        if not port_id in [i.id for i in reserved_ports]:
+        reserved_port = (await session.execute(select(ReservedPort).where(
+            ReservedPort.id == port_id,
+            ReservedPort.user_id == user['id']
+        ))).scalar_one_or_none()
+        if reserved_port is None:
             return 403, "Invalid credentials."
 
-        reserved_port = [i for i in reserved_ports if i.id == port_id][0]
-
-        reserved_port_file_name = os.environ['PODS_META_PATH'] + f"/{pod.name}-{reserved_port.port}.yaml"
-        os.remove(reserved_port_file_name)
-
         await session.delete(reserved_port)
 
-        subprocess.run(f"microk8s kubectl delete svc {pod.name}-{reserved_port.port} -n default", shell=True)
+        await delete_service_object(f"{pod.name}-{reserved_port.port}")
 
     return 200, "Done."
 
 
 async def get_pod_envs(pod_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        # Same fused shape as get_pod_ports: ownership check and
+        # payload in a single statement
+        rows = (await session.execute(
+            select(Pod.id, PodEnv)
+            .outerjoin(PodEnv, PodEnv.pod_id == Pod.id)
+            .where(Pod.id == pod_id, Pod.user_id == user['id'])
+        )).all()
+        if not rows:
             return 403, "Invalid credentials."
 
-        pod = [i for i in pods if i.id == pod_id][0]
-
-        pod_envs = (await session.execute(select(PodEnv).where(
-            PodEnv.user_id == session_jwt['id'],
-            PodEnv.pod_id == pod.id
-        ))).scalars()
+        pod_envs = [env for _, env in rows if env is not None]
 
     return 200, pod_envs
 
 
 async def add_pod_env(pod_id=0, name='', value='', session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        pod = (await session.execute(select(Pod).where(
+            Pod.id == pod_id,
+            Pod.user_id == user['id']
+        ))).scalar_one_or_none()
+        if pod is None:
             return 403, "Invalid credentials."
-
-        pod = [i for i in pods if i.id == pod_id][0]
         pod_env = PodEnv(
             name=name,
             value=value,
-            user_id=user.id,
+            user_id=user['id'],
             pod_id=pod.id
         )
         session.add(pod_env)
@@ -525,22 +589,24 @@ async def add_pod_env(pod_id=0, name='', value='', session_key=''):
 
 async def delete_pod_env(pod_id=0, env_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        owned = (await session.execute(select(Pod.id).where(
+            Pod.id == pod_id,
+            Pod.user_id == user['id']
+        ))).scalar_one_or_none()
+        if owned is None:
             return 403, "Invalid credentials."
 
-        envs = (await session.execute(select(PodEnv).where(PodEnv.user_id == session_jwt['id']))).scalars()
-        envs = [i for i in envs]
-        if not env_id in [i.id for i in envs]:
+        env = (await session.execute(select(PodEnv).where(
+            PodEnv.id == env_id,
+            PodEnv.user_id == user['id']
+        ))).scalar_one_or_none()
+        if env is None:
             return 403, "Invalid credentials."
 
-        env = [i for i in envs if i.id == env_id][0]
         await session.delete(env)
 
     return 200, "Done."
@@ -548,63 +614,58 @@ async def delete_pod_env(pod_id=0, env_id=0, session_key=''):
 
 async def delete_volume(volume_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        volumes = (await session.execute(select(Storage).where(Storage.user_id == session_jwt['id']))).scalars()
-        volumes = [i for i in volumes]
-        if not volume_id in [i.id for i in volumes]:
+        volume = (await session.execute(select(Storage).where(
+            Storage.id == volume_id,
+            Storage.user_id == user['id']
+        ))).scalar_one_or_none()
+        if volume is None:
             return 403, "Invalid credentials."
 
-        volume = [i for i in volumes if i.id == volume_id][0]
-
-        volume_file_name_pv = os.environ['VOLUMES_META_PATH'] + f"/{volume.name}-pv.yaml"
-        volume_file_name_pvc = os.environ['VOLUMES_META_PATH'] + f"/{volume.name}-pvc.yaml"
-        os.remove(volume_file_name_pv)
-        os.remove(volume_file_name_pvc)
-        shutil.rmtree(f"/home/tigron/orchestr8/volumes/{volume.name}-pv")
+        shutil.rmtree(f"{VOLUMES_HOST_PATH}/{volume.name}-pv")
 
         await session.delete(volume)
 
-        subprocess.run(f"microk8s kubectl delete pvc {volume.name}", shell=True)
-        subprocess.run(f"microk8s kubectl delete pv {volume.name}-pv", shell=True)
+        await delete_volume_objects(volume.name)
 
     return 200, "Done."
 
 
 async def recreate_pod(pod_id=0, session_key=''):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return 403, "Invalid credentials."
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        pods = [i for i in pods]
-        if not pod_id in [i.id for i in pods]:
+        # Ownership check and fetch in one indexed lookup instead of
+        # hydrating the user's whole pod list to pick a row
+        pod = (await session.execute(select(Pod).where(
+            Pod.id == pod_id,
+            Pod.user_id == user['id']
+        ))).scalar_one_or_none()
+        if pod is None:
             return 403, "Invalid credentials."
-
-        pod = [i for i in pods if i.id == pod_id][0]
         pod_envs = (await session.execute(select(PodEnv).where(
-            PodEnv.user_id == session_jwt['id'],
+            PodEnv.user_id == user['id'],
             PodEnv.pod_id == pod.id
         ))).scalars()
 
         if pod_envs:
-            pod_envs = [pod_env.to_dict() for pod_env in pod_envs]
+            pod_envs = [{'name': pod_env.name, 'value': pod_env.value} for pod_env in pod_envs]
 
         storage = None
         if pod.storage_id:
             storage = (await session.execute(select(Storage).where(
-                Storage.user_id == session_jwt['id'],
+                Storage.user_id == user['id'],
                 Storage.id == pod.storage_id
             ))).scalar()
 
-        subprocess.run(f"microk8s kubectl delete pod {pod.name} -n default", shell=True)
+        await delete_pod_object(pod.name)
 
-        pod_file_name = create_pod_yaml(
+        manifest = build_pod_manifest(
             pod_name=pod.name,
             storage_id=storage.id if storage else 0,
             container_image=pod.container_image,
@@ -617,21 +678,21 @@ async def recreate_pod(pod_id=0, session_key=''):
             mount_path=pod.mount_path
         )
 
-        subprocess.run(f"microk8s kubectl apply -f {pod_file_name}", shell=True)
+        await create_pod_from_manifest(manifest)
+        invalidate_cache(pod.name)
 
     return 200, "Done."
 
 
 async def get_pod_logs_realtime(ws: WebSocket, pod_id=0):
     async with get_session() as session:
-        pods = (await session.execute(select(Pod).where(Pod.id == pod_id))).scalars()
-        pod = [i for i in pods if i.id == pod_id][0]
+        pod_name = (await session.execute(select(Pod.name).where(Pod.id == pod_id))).scalar_one()
 
     command = [
         "microk8s",
         "kubectl",
         "logs",
-        pod.name,
+        pod_name,
         "-n",
         "default",
         "-f",
@@ -643,12 +704,32 @@ async def get_pod_logs_realtime(ws: WebSocket, pod_id=0):
         stderr=subprocess.PIPE
     )
 
+    # Chunked reads with a ~10 ms flush: one websocket frame carries a
+    # batch of complete lines instead of a recv syscall and a frame per
+    # line, so throughput tracks log volume rather than line count
     try:
+        pending = b""
         while True:
-            line = await process.stdout.readline()
-            if not line:
+            try:
+                chunk = await asyncio.wait_for(process.stdout.read(65536), timeout=0.01)
+            except asyncio.TimeoutError:
+                chunk = None
+
+            if chunk == b"":
+                if pending:
+                    await ws.send_bytes(pending)
                 break
-            await ws.send_text(line.decode().strip())
+
+            if chunk:
+                pending += chunk
+
+            # Flush on the timeout tick, or as soon as 16 KiB of
+            # complete lines piled up; a trailing partial line stays
+            # buffered so frames always end on a line boundary
+            cut = pending.rfind(b"\n")
+            if cut != -1 and (chunk is None or cut >= 16384):
+                await ws.send_bytes(pending[:cut + 1])
+                pending = pending[cut + 1:]
 
     except Exception as e:
         await ws.close(code=1011, reason=str(e))
@@ -663,13 +744,15 @@ async def get_pod_logs_realtime(ws: WebSocket, pod_id=0):
 
 async def auth_ws(session_key, pod_id=0):
     async with get_session() as session:
-        session_jwt = jwt.decode(session_key, os.environ['SECRET_KEY'], algorithms=["HS256"])
-        user = (await session.execute(select(User).where(User.id == session_jwt['id']))).scalar()
-        if not bcrypt.checkpw(session_jwt['key'].encode(), user.session_key.encode()):
+        user = await authenticate(session, session_key)
+        if user is None:
             return False
 
-        pods = (await session.execute(select(Pod).where(Pod.user_id == session_jwt['id']))).scalars()
-        if not pod_id in [i.id for i in pods]:
+        owned = (await session.execute(select(Pod.id).where(
+            Pod.id == pod_id,
+            Pod.user_id == user['id']
+        ))).scalar_one_or_none()
+        if owned is None:
             return False
 
     return True
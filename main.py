@@ -4,23 +4,42 @@
 import os
 import gunicorn.app.base
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from app.core import close_k8s_client, start_pod_watch, stop_pod_watch
 from app.routes import router
+from app.views import close_http_session, get_http_session
 
 
 app = FastAPI(
     title="Orchestr8",
     description="Orchestr8 backend service",
-    version="0.0.1"
+    version="0.0.1",
+    default_response_class=ORJSONResponse
 )
 
 app.include_router(router)
 
 
+@app.on_event("startup")
+async def startup():
+    start_pod_watch()
+    # Build the outbound HTTP session up front so the first Docker Hub
+    # call doesn't pay connector setup
+    await get_http_session()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_pod_watch()
+    await close_http_session()
+    await close_k8s_client()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=['*'],
@@ -0,0 +1,32 @@
+"""Add external port sequence
+
+Revision ID: 4f1e9a2b7c3d
+Revises: 2e855a7cbed3
+Create Date: 2026-08-28 10:14:52.118262
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1e9a2b7c3d'
+down_revision: Union[str, None] = '2e855a7cbed3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE reserved_port_ext_seq START WITH 30001")
+    # Start past any port already handed out by the old MAX()+1 scheme
+    op.execute(
+        "SELECT setval('reserved_port_ext_seq', "
+        "(SELECT GREATEST(30000, COALESCE(MAX(external_port), 30000)) FROM reserved_port))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE reserved_port_ext_seq")
@@ -0,0 +1,29 @@
+"""Index ReservedPort and PodEnv
+
+Revision ID: 8b3c5d1f9e2a
+Revises: 4f1e9a2b7c3d
+Create Date: 2026-08-28 10:31:07.664815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3c5d1f9e2a'
+down_revision: Union[str, None] = '4f1e9a2b7c3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_reserved_port_user_pod', 'reserved_port', ['user_id', 'pod_id'])
+    op.create_index('ix_pod_env_user_pod', 'pod_env', ['user_id', 'pod_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pod_env_user_pod', table_name='pod_env')
+    op.drop_index('ix_reserved_port_user_pod', table_name='reserved_port')